@@ -0,0 +1,245 @@
+import codecs
+import csv
+import itertools
+import os
+import logging
+from typing import Callable, Iterator, List, Optional, Sequence
+
+# 各ステップ (main_step1.py ~ main_step4_Claude.py) で共通のCSV変換処理
+# ロギング設定は呼び出し元のスクリプトで行う (ログファイルは実行ファイルと同じディレクトリに出力)
+
+# CSVデータの入力開始ーーーーーーーーーーーーーーーーーーーーー
+# 試すエンコーディングのリスト (優先順位順)
+ENCODINGS_TO_TRY = ['utf-8', 'shift_jis', 'cp932']
+# エンコーディング判定のために読み込む先頭のバイト数
+ENCODING_PROBE_SIZE = 64 * 1024
+# 出力ファイルの書き込みバッファサイズ (1行ずつ書き出す際のシステムコール回数を減らす)
+OUTPUT_BUFFER_SIZE = 1024 * 1024
+
+# Shift_JISでエンコードできない丸数字を通常数字に置換するための変換テーブル
+MARU_DIGIT_TABLE = str.maketrans({
+    '①': '1', '②': '2', '③': '3', '④': '4', '⑤': '5',
+    '⑥': '6', '⑦': '7', '⑧': '8', '⑨': '9', '⑩': '10',
+})
+
+# 予約情報の行を変換する関数: transform(会議室名, 行) -> 出力する行 (スキップする場合はNone)
+RowTransform = Callable[[str, List[str]], Optional[List[str]]]
+
+def normalize_room_name(room_name: str) -> str:
+    """会議室名から "仙台合同庁舎" と "／仙台地方振興事務所" を除去し、丸数字を通常数字に置換"""
+    return room_name.replace('仙台合同庁舎', '').replace('／仙台地方振興事務所', '').translate(MARU_DIGIT_TABLE)
+
+def _convert_rows(
+    input_file_path: str,
+    output_file_path: str,
+    open_encoding: str,
+    output_header: Callable[[List[str]], Sequence[str]],
+    build_row_transform: Callable[[List[str]], Optional[RowTransform]],
+    clean_room_name: Optional[Callable[[str], str]],
+    encoding: str,
+) -> Optional[int]:
+    """
+    入力CSVを指定されたエンコーディングで1行ずつ読み込み、変換して出力CSVに書き出す
+
+    途中で読み込めない文字があった場合は、書きかけの出力ファイルを削除してUnicodeDecodeErrorを送出する
+
+    Returns:
+        int: 出力した予約データの件数 (空のファイルなど変換できなかった場合はNone)
+    """
+    # ファイル全体をメモリに読み込まず、1行ずつ読み込んで処理する
+    with open(input_file_path, 'r', encoding=open_encoding, newline='') as f_in:
+        reader = csv.reader(f_in)
+
+        header_row = next(reader, None)
+
+        if header_row is None:
+            msg = "エラー: CSVファイルが空です。"
+            logging.warning(msg)
+            print(msg)
+            return None
+
+# CSVデータの入力終了ーーーーーーーーーーーーーーーーーーーーー
+
+# CSVデータの変換処理開始ーーーーーーーーーーーーーーーーーーーーー
+        # ヘッダー行の処理 (元のヘッダーから必要なカラムのインデックスを取得するなど)
+        transform = build_row_transform(header_row)
+        if transform is None:
+            return None
+        new_header = output_header(header_row)
+
+        # 会議室名の整形が指定されていない場合は検出した会議室名をそのまま使う
+        normalize: Callable[[str], str] = str if clean_room_name is None else clean_room_name
+
+        # データ行の処理
+        # 変換後の行を1行ずつ返すジェネレータ (writer.writerowsに渡し、書き出しのループをCの実装側で回す)
+        rows_written = 0
+        rows_skipped = 0
+
+        def generate_rows() -> Iterator[List[str]]:
+            nonlocal rows_written, rows_skipped
+            # 最初の会議室名の行が見つかるまでの行は予約情報として扱わないため読み飛ばす
+            # (以降は会議室名が必ず決まっているため、予約情報の行ごとに会議室名の有無を確認しない)
+            # (会議室名の行の判定は下のブロックの処理と同じ形で行う)
+            for row in reader:
+                col1 = row[1] if len(row) > 1 else ''
+                col2_stripped = row[2].strip() if len(row) > 2 else ''
+                if not col2_stripped and '会議室' in col1:
+                    break
+            else:
+                return
+
+            # 会議室名の行とそれに続く予約情報の行のブロックを順に処理する
+            for row in itertools.chain((row,), reader):
+                if not row:
+                    continue
+
+                # 判定に使う列の値は行ごとに1回だけ取り出す (strip()の結果も使い回す)
+                col1 = row[1] if len(row) > 1 else ''
+                col2_stripped = row[2].strip() if len(row) > 2 else ''
+
+                # 会議室名の行を判定 (app.jsのロジックを参考)
+                # この判定は元の行データ（削除前）に対して行う
+                # 3列目が空かどうかを先に判定し、予約情報の行では部分文字列の検索を行わない
+                # (会議室名は「１００１会議室（…）」のように途中に「会議室」を含むため、startswithでは判定できない)
+                if not col2_stripped:
+                    if '会議室' in col1:
+                        current_kaigishitsu = col1.strip()
+                        logging.info(f"会議室名検出: '{current_kaigishitsu}'")
+                        # 会議室名の整形は会議室ごとに1回だけ行う
+                        room_name = normalize(current_kaigishitsu)
+                    continue
+
+                # 予約情報の行に会議室名を追加
+                new_row = transform(room_name, row)
+                if new_row is None:
+                    rows_skipped += 1
+                    continue # この行はスキップ
+
+                rows_written += 1
+                yield new_row
+
+# CSVデータの出力ーーーーーーーーーーーーーーーーーーーーー
+        # 変換後のデータを指定されたエンコーディングで書き出し
+        # エンコードできない文字は'?'に置換 (errors='replace')
+        # 変換結果はリストに溜めずに1行ずつ書き出す (大きめのバッファでまとめてディスクに書き込む)
+        # 出力ファイルはtryの外で開く (開けなかった場合に、同名の以前の出力ファイルを削除しないようにする)
+        f_out = open(output_file_path, 'w', encoding=encoding, errors='replace', newline='', buffering=OUTPUT_BUFFER_SIZE)
+        try:
+            with f_out:
+                writer = csv.writer(f_out)
+                writer.writerow(new_header)
+                writer.writerows(generate_rows())
+        except Exception:
+            # 途中でエラーが発生した場合は書きかけの出力ファイルを残さない
+            if os.path.exists(output_file_path):
+                os.remove(output_file_path)
+            raise
+
+        # 行ごとのログは出力せず、処理件数のみをまとめて記録する
+        logging.info(f"予約データの変換件数: {rows_written} 件 (スキップ: {rows_skipped} 件)")
+
+    return rows_written
+
+def convert(
+    input_file_path: str,
+    output_file_path: str,
+    *,
+    output_header: Callable[[List[str]], Sequence[str]],
+    build_row_transform: Callable[[List[str]], Optional[RowTransform]],
+    clean_room_name: Optional[Callable[[str], str]] = None,
+    encoding: str = 'shift_jis',
+) -> Optional[int]:
+    """
+    会議室予約情報のCSVを変換する
+
+    入力CSVを1行ずつ読み込み、会議室名の行とそれに続く予約情報の行を判定して、
+    予約情報の行だけをbuild_row_transformが返すtransformで変換して書き出す。
+
+    Args:
+        input_file_path (str): 入力CSVファイルのパス (異なるエンコーディングを自動検出)
+        output_file_path (str): 出力CSVファイルのパス
+        output_header (callable): 入力CSVのヘッダー行を受け取り、出力CSVのヘッダー行を返す関数
+        build_row_transform (callable): 入力CSVのヘッダー行を受け取り、transform(会議室名, 行) を返す関数
+            必須カラムがないなど変換できない場合はNoneを返す。
+            (transformは予約情報の行を変換して出力する行を返し、スキップする行ではNoneを返す)
+        clean_room_name (callable): 検出した会議室名を出力用に整える関数 (会議室ごとに1回だけ呼ばれる)
+        encoding (str): 出力CSVファイルのエンコーディング
+            (エンコードできない文字は'?'に置換 (errors='replace'))
+
+    Returns:
+        int: 出力した予約データの件数 (変換が完了しなかった場合はNone)
+    """
+    try:
+        logging.info(f"変換開始: 入力ファイル='{input_file_path}', 出力ファイル='{output_file_path}'")
+
+        # ファイル全体ではなく先頭部分だけをバイナリで読み込み、エンコーディングを判定する
+        with open(input_file_path, 'rb') as f_probe:
+            probe = f_probe.read(ENCODING_PROBE_SIZE)
+
+        detected_encoding = None
+        for enc in ENCODINGS_TO_TRY:
+            try:
+                # 判定範囲の末尾でマルチバイト文字が途切れていてもエラーにならないようインクリメンタルデコーダを使う
+                codecs.getincrementaldecoder(enc)().decode(probe)
+            except UnicodeDecodeError:
+                logging.warning(f"ファイルは '{enc}' エンコーディングで読み込めませんでした。次のエンコーディングを試します。")
+                continue
+            detected_encoding = enc
+            logging.info(f"ファイルは '{detected_encoding}' エンコーディングで正常に読み込まれました。")
+            break # 成功したらループを抜ける
+
+        if detected_encoding is None:
+            msg = f"エラー: 入力ファイル '{input_file_path}' をサポートされているどのエンコーディング ({', '.join(ENCODINGS_TO_TRY)}) でも読み込むことができませんでした。ファイルの形式を確認してください。"
+            logging.error(msg)
+            print(msg)
+            return None
+
+        # utf-8はBOM付きのファイルも読めるようにutf-8-sigで開く (BOMは自動的に除去される)
+        if detected_encoding == 'utf-8' and probe.startswith(codecs.BOM_UTF8):
+            logging.info("UTF-8 BOMを除去しました。")
+
+        # 先頭部分だけの判定では、判定範囲より後ろにある文字 (例: cp932の丸数字①やNEC/IBM拡張文字) を読めない場合がある
+        # その場合は書きかけの出力ファイルを削除し、次のエンコーディングで最初から変換し直す
+        for enc in ENCODINGS_TO_TRY[ENCODINGS_TO_TRY.index(detected_encoding):]:
+            open_encoding = 'utf-8-sig' if enc == 'utf-8' else enc
+            try:
+                rows_written = _convert_rows(
+                    input_file_path, output_file_path, open_encoding,
+                    output_header, build_row_transform, clean_room_name, encoding,
+                )
+            except UnicodeDecodeError as e:
+                logging.warning(f"ファイルは '{enc}' エンコーディングで最後まで読み込めませんでした ({e})。次のエンコーディングで変換し直します。")
+                continue
+            break # 成功したらループを抜ける
+        else:
+            msg = f"エラー: 入力ファイル '{input_file_path}' をサポートされているどのエンコーディング ({', '.join(ENCODINGS_TO_TRY)}) でも読み込むことができませんでした。ファイルの形式を確認してください。"
+            logging.error(msg)
+            print(msg)
+            return None
+
+        if rows_written is None:
+            return None
+
+        if rows_written == 0:
+            os.remove(output_file_path)
+            msg = "エラー: 変換対象の予約データが見つかりませんでした。入力ファイルの形式を確認してください。"
+            logging.warning(msg)
+            print(msg)
+            return None
+# CSVデータの変換処理終了ーーーーーーーーーーーーーーーーーーーーー
+
+        msg = f"変換が完了しました。出力ファイル: {output_file_path}"
+        logging.info(msg)
+        print(msg)
+        return rows_written
+
+    except FileNotFoundError:
+        msg = f"エラー: 入力ファイルが見つかりません: {input_file_path}"
+        logging.error(msg)
+        print(msg)
+    except Exception as e:
+        msg = f"処理中に予期せぬエラーが発生しました: {e}"
+        logging.exception(msg) # 詳細なトレースバックをログに記録
+        print(msg)
+        print("詳細はログファイル (neo_roomcsv_converter.log) をご確認ください。")
+    return None
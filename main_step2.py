@@ -1,11 +1,10 @@
-
-import csv
-import io
 import sys
 import os
 import logging
 from datetime import datetime
 
+import converter_core
+
 # ロギング設定
 # 実行ファイルと同じディレクトリにログファイルを出力
 log_dir = os.path.dirname(sys.argv[0]) if getattr(sys, 'frozen', False) else os.path.dirname(os.path.abspath(__file__))
@@ -16,9 +15,43 @@ logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(levelname)s - %(message)s'
 )
-# CSVデータの入力開始ーーーーーーーーーーーーーーーーーーーーー
-# 試すエンコーディングのリスト (優先順位順)
-ENCODINGS_TO_TRY = ['utf-8', 'shift_jis', 'cp932']
+
+# 削除対象のカラム名
+COLUMNS_TO_DELETE = [
+    '施設備品ID', '施設備品名', '利用目的', '内容', '情報公開レベル',
+    '重要度', '予約種別', 'ＩＤ（システムＩＤ：自動発番）', 'フラグ',
+    'アイコン番号', '所有者ID', '所有者名'
+]
+
+def find_delete_indices(header_row):
+    """削除するカラムのインデックスを特定（逆順にして削除時にインデックスがずれないようにする）"""
+    return sorted([
+        i for i, col in enumerate(header_row) if col in COLUMNS_TO_DELETE
+    ], reverse=True)
+
+def build_header(header_row):
+    """ヘッダーから削除対象のカラムを削除し、会議室名カラムを先頭に追加"""
+    header_row = list(header_row)
+    for index in find_delete_indices(header_row):
+        del header_row[index]
+    return ['会議室名', *header_row]
+
+def build_row_transform(header_row):
+    """予約情報の行から削除対象のカラムを削除し、先頭に会議室名を追加する関数を返す"""
+    # 元のheader_rowからインデックスを収集
+    delete_indices = find_delete_indices(header_row)
+
+    def transform(room_name, row):
+        # データ行からも削除対象のカラムを削除
+        # ヘッダーと同じ順序で削除を行うことでインデックスのずれに対応
+        # (行は1行ずつ読み込んでいて他で使わないため、コピーせずにそのまま削除する)
+        for index in delete_indices:
+            del row[index]
+
+        # 会議室名カラム (除去・置換済み) を先頭に付けた新しい行を作成し、
+        # Shift_JISでエンコードできない文字の置換 (例: 丸数字) を適用
+        return [room_name, *(cell.translate(converter_core.MARU_DIGIT_TABLE) for cell in row)]
+    return transform
 
 def convert_csv(input_file_path, output_file_path):
     """
@@ -28,142 +61,13 @@ def convert_csv(input_file_path, output_file_path):
         input_file_path (str): 入力CSVファイルのパス (異なるエンコーディングを自動検出)
         output_file_path (str): 出力CSVファイルのパス (Shift_JIS)
     """
-    try:
-        logging.info(f"変換開始: 入力ファイル='{input_file_path}', 出力ファイル='{output_file_path}'")
-        
-        csv_c = None
-        detected_encoding = None
-        for enc in ENCODINGS_TO_TRY:
-            try:
-                with open(input_file_path, 'r', encoding=enc) as f_in:
-                    raw_content = f_in.read()
-                    # BOM (Byte Order Mark) を除去する
-                    if raw_content.startswith('\ufeff'):
-                        raw_content = raw_content.lstrip('\ufeff')
-                        logging.info("UTF-8 BOMを除去しました。")
-                    csv_c = raw_content # .replace('"', '') を削除
-                    detected_encoding = enc
-                logging.info(f"ファイルは '{detected_encoding}' エンコーディングで正常に読み込まれました。")
-                break # 成功したらループを抜ける
-            except UnicodeDecodeError:
-                logging.warning(f"ファイルは '{enc}' エンコーディングで読み込めませんでした。次のエンコーディングを試します。")
-                continue
-            except Exception as e:
-                # FileNotFoundErrorなどはメインのtry-exceptで処理されるため、
-                # ここではUnicodeDecodeError以外の不明なエラーが発生した場合を想定し、
-                # ログに記録し、さらに外側のExceptionブロックでキャッチされるように再raise
-                logging.error(f"ファイル読み込み中に予期せぬエラーが発生しました ({enc}): {e}")
-                # ここでraiseしないことで、他のエンコーディングも試行し続ける
-        
-        if csv_c is None:
-            msg = f"エラー: 入力ファイル '{input_file_path}' をサポートされているどのエンコーディング ({', '.join(ENCODINGS_TO_TRY)}) でも読み込むことができませんでした。ファイルの形式を確認してください。"
-            logging.error(msg)
-            print(msg)
-            return
-
-        csv_file = io.StringIO(csv_c)
-        
-        reader = csv.reader(csv_file)
-        
-        lines = list(reader)
-        
-        # BOM除去後の処理に移動
-        if not lines:
-            msg = "エラー: CSVファイルが空です。"
-            logging.warning(msg)
-            print(msg)
-            return
-
-        result_rows = []
-        current_kaigishitsu = None
-# CSVデータの入力終了ーーーーーーーーーーーーーーーーーーーーー
-
-# CSVデータの変換処理開始ーーーーーーーーーーーーーーーーーーーーー
-        # ヘッダー行の処理
-        header_row = lines[0]
-        
-        # 削除対象のカラム名
-        columns_to_delete = [
-            '施設備品ID', '施設備品名', '利用目的', '内容', '情報公開レベル',
-            '重要度', '予約種別', 'ＩＤ（システムＩＤ：自動発番）', 'フラグ',
-            'アイコン番号', '所有者ID', '所有者名'
-        ]
-        
-        # 削除するカラムのインデックスを特定（逆順にして削除時にインデックスがずれないようにする）
-        # 元のheader_rowからインデックスを収集
-        delete_indices = sorted([
-            i for i, col in enumerate(header_row) if col in columns_to_delete
-        ], reverse=True)
-
-        # ヘッダーから削除対象のカラムを削除
-        for index in delete_indices:
-            del header_row[index]
-
-        # 会議室名カラムをヘッダーの先頭に追加
-        header_row.insert(0, '会議室名')
-        result_rows.append(header_row)
-
-        # データ行の処理
-        for i, row in enumerate(lines[1:]):
-            if not row:
-                continue
-
-            # 会議室名の行を判定 (app.jsのロジックを参考)
-            # この判定は元の行データ（削除前）に対して行う
-            if len(row) > 1 and '会議室' in row[1] and (len(row) <= 2 or not row[2].strip()):
-                current_kaigishitsu = row[1].strip()
-                logging.info(f"会議室名検出: '{current_kaigishitsu}'")
-                continue
-
-            # 予約情報の行に会議室名を追加
-            # 予約情報の行にのみ削除を適用する
-            if current_kaigishitsu and len(row) > 2 and row[2].strip():
-                new_row = row[:] # オリジナルを保持するためスライスでコピー
-                
-                # データ行からも削除対象のカラムを削除
-                # ヘッダーと同じ順序で削除を行うことでインデックスのずれに対応
-                for index in delete_indices:
-                    del new_row[index]
-
-                # 会議室名カラムをデータ行の先頭に追加
-                new_row.insert(0, current_kaigishitsu)
-                
-                # "仙台合同庁舎" と "／仙台地方振興事務所" の除去
-                new_row[0] = new_row[0].replace('仙台合同庁舎', '').replace('／仙台地方振興事務所', '')
-                
-                # Shift_JISでエンコードできない文字の置換 (例: 丸数字)
-                for j in range(len(new_row)):
-                    new_row[j] = new_row[j].replace('①', '1').replace('②', '2').replace('③', '3').replace('④', '4').replace('⑤', '5') \
-                                         .replace('⑥', '6').replace('⑦', '7').replace('⑧', '8').replace('⑨', '9').replace('⑩', '10')
-
-                result_rows.append(new_row)
-
-        if len(result_rows) <= 1:
-            msg = "エラー: 変換対象の予約データが見つかりませんでした。入力ファイルの形式を確認してください。"
-            logging.warning(msg)
-            print(msg)
-            return
-# CSVデータの変換処理終了ーーーーーーーーーーーーーーーーーーーーー
-# CSVデータの出力ーーーーーーーーーーーーーーーーーーーーー
-        # 変換後のデータをShift_JISで書き出し
-        # encoding='shift_jis'でエンコードできない文字は'?'に置換 (errors='replace')
-        with open(output_file_path, 'w', encoding='shift_jis', errors='replace', newline='') as f_out:
-            writer = csv.writer(f_out)
-            writer.writerows(result_rows)
-        
-        msg = f"変換が完了しました。出力ファイル: {output_file_path}"
-        logging.info(msg)
-        print(msg)
-
-    except FileNotFoundError:
-        msg = f"エラー: 入力ファイルが見つかりません: {input_file_path}"
-        logging.error(msg)
-        print(msg)
-    except Exception as e:
-        msg = f"処理中に予期せぬエラーが発生しました: {e}"
-        logging.exception(msg) # 詳細なトレースバックをログに記録
-        print(msg)
-        print("詳細はログファイル (neo_roomcsv_converter.log) をご確認ください。")
+    converter_core.convert(
+        input_file_path, output_file_path,
+        output_header=build_header,
+        build_row_transform=build_row_transform,
+        # "仙台合同庁舎" と "／仙台地方振興事務所" の除去、丸数字の置換は会議室ごとに1回だけ行う
+        clean_room_name=converter_core.normalize_room_name,
+    )
 
 
 if __name__ == '__main__':